@@ -1,11 +1,24 @@
-import json
+"""Meshcapade avatar upload and measurement download tool."""
+
+import argparse
+import atexit
+import hashlib
 import mimetypes
 import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+import httpx
+import orjson
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 load_dotenv()
 
@@ -13,28 +26,140 @@ load_dotenv()
 USERNAME = os.getenv("USERNAME")
 PASSWORD = os.getenv("PASSWORD")
 API_URL = os.getenv("API_URL", "https://api.meshcapade.com/api/v1")
+REQUEST_TIMEOUT = 30  # seconds to wait on connect/read before giving up
+API_RETRIES = 3  # retries for idempotent API calls on transient gateway errors
+RETRY_STATUSES = frozenset({502, 503, 504})
+TOKEN_URL = (
+    "https://auth.meshcapade.com/realms/meshcapade-me/protocol/openid-connect/token"
+)
+TOKEN_CACHE_FILE = Path.home() / ".cache" / "meshcapade" / "token.json"
+ACTIONS = ["upload", "download", "export"]
+VALID_GENDERS = frozenset({"female", "male", "neutral"})
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png"})
+UPLOAD_CACHE_FILE = ".upload_cache.json"
+CONTENT_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
 
 if not USERNAME or not PASSWORD:
     raise ValueError("USERNAME and PASSWORD must be set in .env file")
 
+# Shared HTTP session for the auth realm and S3 transfers, so repeated calls
+# to the same host reuse pooled keep-alive connections instead of paying a
+# TLS handshake every time
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]
+        ),
+    ),
+)
+atexit.register(SESSION.close)
+
+# HTTP/2 client for the Meshcapade API; concurrent requests from upload and
+# batch worker threads are multiplexed over a single connection
+API_CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(http2=True, retries=3),
+    timeout=REQUEST_TIMEOUT,
+    follow_redirects=True,
+)
+atexit.register(API_CLIENT.close)
+
+# In-memory copy of the token cache, shared by batch worker threads
+_token: Dict = {}
+_token_lock = threading.Lock()
+
+
+def _load_json(path: Path):
+    """Read and parse a JSON file."""
+    return orjson.loads(Path(path).read_bytes())
+
+
+def _dump_json(path: Path, obj):
+    """Write an object to a JSON file, pretty-printed."""
+    Path(path).write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+
+
+def _load_cached_token() -> Dict:
+    """Load the token cache for the configured user, if any."""
+    if not _token and TOKEN_CACHE_FILE.exists():
+        try:
+            cached = _load_json(TOKEN_CACHE_FILE)
+        except (OSError, ValueError):
+            cached = {}
+        if cached.get("username") == USERNAME:
+            _token.update(cached)
+    return _token
+
+
+def _request_token(grant: Dict[str, str]) -> str:
+    """Request a token grant from the auth realm and cache the result."""
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    data = {"client_id": "meshcapade-me", **grant}
 
-def authenticate() -> str:
-    """Authenticate with Meshcapade and return access token."""
-    url = (
-        "https://auth.meshcapade.com/realms/meshcapade-me/protocol/openid-connect/token"
+    response = SESSION.post(
+        TOKEN_URL, headers=headers, data=data, timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    token_data = orjson.loads(response.content)
+
+    _token.clear()
+    _token.update(
+        {
+            "username": USERNAME,
+            "access_token": token_data["access_token"],
+            "refresh_token": token_data.get("refresh_token"),
+            "exp": time.time() + token_data.get("expires_in", 0),
+        }
     )
 
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {
-        "grant_type": "password",
-        "client_id": "meshcapade-me",
-        "username": USERNAME,
-        "password": PASSWORD,
-    }
+    # Persist for later runs; created readable by the current user only
+    TOKEN_CACHE_FILE.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    fd = os.open(TOKEN_CACHE_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        # Tighten a cache file left behind with looser permissions
+        os.fchmod(f.fileno(), 0o600)
+        f.write(orjson.dumps(_token, option=orjson.OPT_INDENT_2))
+
+    return _token["access_token"]
+
+
+def get_token(rejected_token: Optional[str] = None) -> str:
+    """Return an access token, authenticating with Meshcapade only if needed.
+
+    A cached token is reused until shortly before it expires, or until the API
+    rejects it (``rejected_token``). After that the refresh token is tried
+    first, falling back to the password grant. Thread-safe: workers that hit a
+    401 with the same token share one refresh, and later ones pick up the
+    token another worker already renewed.
+    """
+    with _token_lock:
+        cached = _load_cached_token()
+        access_token = cached.get("access_token")
+        if (
+            access_token
+            and access_token != rejected_token
+            and time.time() < cached.get("exp", 0) - 30
+        ):
+            return access_token
+
+        if cached.get("refresh_token"):
+            try:
+                return _request_token(
+                    {
+                        "grant_type": "refresh_token",
+                        "refresh_token": cached["refresh_token"],
+                    }
+                )
+            except requests.HTTPError:
+                # Refresh token expired or revoked
+                pass
 
-    response = requests.post(url, headers=headers, data=data)
-    response.raise_for_status()
-    return response.json()["access_token"]
+        return _request_token(
+            {"grant_type": "password", "username": USERNAME, "password": PASSWORD}
+        )
 
 
 def get_auth_headers(access_token: str) -> Dict[str, str]:
@@ -45,16 +170,61 @@ def get_auth_headers(access_token: str) -> Dict[str, str]:
     }
 
 
+@dataclass
+class ApiClient:
+    """HTTP client, base URL and auth headers shared by all API calls."""
+
+    session: httpx.Client
+    base: str
+    headers: Dict[str, str]
+
+
+def create_api_client() -> ApiClient:
+    """Authenticate and build the API client for this run."""
+    return ApiClient(
+        session=API_CLIENT, base=API_URL, headers=get_auth_headers(get_token())
+    )
+
+
+def _send_with_retries(
+    client: ApiClient, method: str, url: str, headers: Dict[str, str], **kwargs
+) -> httpx.Response:
+    """Send an API request, retrying GETs on 502/503/504 with backoff."""
+    for attempt in range(API_RETRIES + 1):
+        response = client.session.request(method, url, headers=headers, **kwargs)
+        if (
+            method != "GET"
+            or response.status_code not in RETRY_STATUSES
+            or attempt == API_RETRIES
+        ):
+            return response
+        time.sleep(0.5 * 2**attempt)
+
+
+def _request_with_auth(
+    client: ApiClient, method: str, url: str, **kwargs
+) -> httpx.Response:
+    """Send an authorized API request, refreshing the token once on 401."""
+    # Snapshot the headers so a 401 is attributed to the token actually sent
+    headers = dict(client.headers)
+    response = _send_with_retries(client, method, url, headers, **kwargs)
+    if response.status_code == 401:
+        rejected_token = headers["Authorization"].removeprefix("Bearer ")
+        client.headers["Authorization"] = f"Bearer {get_token(rejected_token)}"
+        response = _send_with_retries(client, method, url, client.headers, **kwargs)
+
+    return response
+
+
 def get_available_subjects() -> List[str]:
     """Get list of available test subjects."""
-    data_dir = Path("data")
     subjects = []
 
-    for item in data_dir.iterdir():
-        if item.is_dir() and not item.name.startswith("."):
-            avatar_json = item / "avatar.json"
-            if avatar_json.exists():
-                subjects.append(item.name)
+    with os.scandir("data") as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                if os.path.exists(os.path.join(entry.path, "avatar.json")):
+                    subjects.append(entry.name)
 
     return sorted(subjects)
 
@@ -64,15 +234,14 @@ def load_subject_data(subject_name: str) -> tuple:
     subject_dir = Path("data") / subject_name
 
     # Load avatar metadata
-    with open(subject_dir / "avatar.json") as f:
-        avatar_data = json.load(f)
+    avatar_data = _load_json(subject_dir / "avatar.json")
 
     # Validate and normalize gender
-    valid_genders = ["female", "male", "neutral"]
-    gender = avatar_data.get("gender", "neutral").lower()
-    if gender not in valid_genders:
+    raw_gender = avatar_data.get("gender", "neutral")
+    gender = raw_gender.lower()
+    if gender not in VALID_GENDERS:
         print(
-            f"Warning: Invalid gender '{avatar_data.get('gender')}' for {subject_name}, defaulting to 'neutral'"
+            f"Warning: Invalid gender '{raw_gender}' for {subject_name}, defaulting to 'neutral'"
         )
         gender = "neutral"
     avatar_data["gender"] = gender
@@ -93,8 +262,17 @@ def load_subject_data(subject_name: str) -> tuple:
     else:
         # Fallback to any order if no upload_order specified
         print("No upload order specified, using default file order")
-        for ext in ["*.jpg", "*.jpeg", "*.png"]:
-            image_files.extend(subject_dir.glob(ext))
+        # Sort by name so the images picked and their slot order are stable
+        with os.scandir(subject_dir) as entries:
+            image_files = sorted(
+                (
+                    Path(entry.path)
+                    for entry in entries
+                    if entry.is_file()
+                    and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+                ),
+                key=lambda path: path.name,
+            )
 
     # Limit to 4 images
     image_files = image_files[:4]
@@ -102,51 +280,66 @@ def load_subject_data(subject_name: str) -> tuple:
     return avatar_data, image_files
 
 
-def create_avatar(access_token: str) -> str:
+def create_avatar(client: ApiClient) -> str:
     """Create empty avatar and return avatar ID."""
-    url = f"{API_URL}/avatars/create/from-images"
-    headers = get_auth_headers(access_token)
+    url = f"{client.base}/avatars/create/from-images"
 
-    response = requests.post(url, headers=headers)
+    response = _request_with_auth(client, "POST", url)
     response.raise_for_status()
 
-    return response.json()["data"]["id"]
+    return orjson.loads(response.content)["data"]["id"]
 
 
-def upload_images(access_token: str, avatar_id: str, image_files: List[Path]):
-    """Upload all images for the avatar in the specified order."""
-    headers = get_auth_headers(access_token)
+def _upload_one(image_file: Path, presigned_url: str):
+    """Upload a single image to its presigned URL."""
+    # upload_order may name files outside the table; only those hit mimetypes
+    content_type = (
+        CONTENT_TYPES.get(image_file.suffix.lower())
+        or mimetypes.guess_type(image_file)[0]
+        or "image/jpeg"
+    )
 
-    for i, image_file in enumerate(image_files, 1):
-        print(f"  Uploading image {i}/{len(image_files)}: {image_file.name}...")
+    # Stream the file body; an explicit length avoids chunked encoding on S3
+    size = image_file.stat().st_size
+    upload_headers = {"Content-Type": content_type, "Content-Length": str(size)}
+    with open(image_file, "rb") as f:
+        response = SESSION.put(
+            presigned_url, data=f, headers=upload_headers, timeout=REQUEST_TIMEOUT
+        )
+    response.raise_for_status()
 
-        # Generate presigned URL
-        url = f"{API_URL}/avatars/{avatar_id}/images"
-        response = requests.post(url, headers=headers)
-        response.raise_for_status()
 
-        presigned_url = response.json()["data"]["links"]["upload"]
+def upload_images(client: ApiClient, avatar_id: str, image_files: List[Path]):
+    """Upload all images for the avatar in the specified order."""
+    url = f"{client.base}/avatars/{avatar_id}/images"
 
-        # Upload image with correct content type
-        with open(image_file, "rb") as f:
-            image_content = f.read()
+    # Generate presigned URLs sequentially so image slots keep the upload order
+    presigned_urls = []
+    for image_file in image_files:
+        response = _request_with_auth(client, "POST", url)
+        response.raise_for_status()
+        presigned_url = orjson.loads(response.content)["data"]["links"]["upload"]
+        presigned_urls.append(presigned_url)
 
-        # Get content type using mimetypes module
-        content_type = mimetypes.guess_type(image_file)[0] or "image/jpeg"
+    # Upload image bodies in parallel
+    with ThreadPoolExecutor(max_workers=max(1, min(4, len(image_files)))) as executor:
+        futures = []
+        for i, (image_file, presigned_url) in enumerate(
+            zip(image_files, presigned_urls), 1
+        ):
+            print(f"  Uploading image {i}/{len(image_files)}: {image_file.name}...")
+            futures.append(executor.submit(_upload_one, image_file, presigned_url))
 
-        upload_headers = {"Content-Type": content_type}
-        response = requests.put(
-            presigned_url, data=image_content, headers=upload_headers
-        )
-        response.raise_for_status()
+        # Surface the first failed upload
+        for future in futures:
+            future.result()
 
 
 def start_fitting(
-    access_token: str, avatar_id: str, subject_name: str, avatar_data: Dict
+    client: ApiClient, avatar_id: str, subject_name: str, avatar_data: Dict
 ) -> Dict:
     """Start the fitting process and return the response."""
-    url = f"{API_URL}/avatars/{avatar_id}/fit-to-images"
-    headers = get_auth_headers(access_token)
+    url = f"{client.base}/avatars/{avatar_id}/fit-to-images"
 
     payload = {
         "avatarname": subject_name,
@@ -160,36 +353,35 @@ def start_fitting(
     if "weight" in avatar_data:
         payload["weight"] = avatar_data["weight"]
 
-    response = requests.post(url, headers=headers, json=payload)
+    response = _request_with_auth(client, "POST", url, json=payload)
     response.raise_for_status()
 
 
-def export_3d_model(access_token: str, avatar_id: str, subject_name: str) -> bool:
+def export_3d_model(client: ApiClient, avatar_id: str, subject_name: str) -> bool:
     """Export and download 3D model as OBJ file."""
-    url = f"{API_URL}/avatars/{avatar_id}/export"
-    headers = get_auth_headers(access_token)
+    url = f"{client.base}/avatars/{avatar_id}/export"
 
     payload = {"format": "obj", "pose": "a"}
 
     print("Requesting 3D model export...")
-    response = requests.post(url, headers=headers, json=payload)
+    response = _request_with_auth(client, "POST", url, json=payload)
     response.raise_for_status()
 
-    export_data = response.json()
+    export_data = orjson.loads(response.content)
+    attributes = export_data.get("data", {}).get("attributes", {})
+    current_state = attributes.get("state", "UNKNOWN")
 
     # Check if export is ready
-    if export_data.get("data", {}).get("attributes", {}).get("state") == "READY":
+    if current_state == "READY":
         print("✓ Export is ready! Downloading 3D model...")
 
         # Get download URL
-        download_url = (
-            export_data.get("data", {}).get("attributes", {}).get("url", {}).get("path")
-        )
+        download_url = attributes.get("url", {}).get("path")
 
         if download_url:
             # Download the OBJ file
             print(f"Downloading from: {download_url}")
-            obj_response = requests.get(download_url)
+            obj_response = SESSION.get(download_url, timeout=REQUEST_TIMEOUT)
             obj_response.raise_for_status()
 
             # Save OBJ file
@@ -203,110 +395,300 @@ def export_3d_model(access_token: str, avatar_id: str, subject_name: str) -> boo
             print("❌ No download URL found in response")
             return False
     else:
-        current_state = (
-            export_data.get("data", {}).get("attributes", {}).get("state", "UNKNOWN")
-        )
         print(f"❌ Export not ready yet. Current state: {current_state}")
         return False
 
 
-def download_measurements(access_token: str, avatar_id: str, subject_name: str) -> bool:
-    """Download measurements if avatar is ready."""
-    url = f"{API_URL}/avatars/{avatar_id}"
-    headers = get_auth_headers(access_token)
+def convert_measurements(raw_measurements: Dict) -> Dict:
+    """Convert measurements to include both metric and imperial units."""
+    processed_measurements = {}
+    for measurement_name, value in raw_measurements.items():
+        if isinstance(value, (int, float)):
+            if measurement_name.lower() == "weight":
+                # Weight: kg to lbs conversion
+                kg_rounded = round(value, 2)
+                lbs_rounded = round(value * 2.20462, 2)
+                processed_measurements[measurement_name] = {
+                    "kg": kg_rounded,
+                    "lbs": lbs_rounded,
+                }
+            else:
+                # Length measurements: cm to inches conversion
+                cm_rounded = round(value, 2)
+                inches_rounded = round(value / 2.54, 2)
+                processed_measurements[measurement_name] = {
+                    "cm": cm_rounded,
+                    "in": inches_rounded,
+                }
+        else:
+            # Keep non-numeric values as-is
+            processed_measurements[measurement_name] = value
+
+    return processed_measurements
+
+
+def download_measurements(
+    client: ApiClient,
+    avatar_id: str,
+    subject_name: str,
+    poll: bool = False,
+    max_wait_seconds: float = 3600,
+) -> bool:
+    """Download measurements if avatar is ready.
+
+    With ``poll`` set, keep checking with exponential backoff (2s, 4s, ...
+    capped at 60s, reset whenever the state changes) until the avatar is
+    ready or ``max_wait_seconds`` has elapsed.
+    """
+    url = f"{client.base}/avatars/{avatar_id}"
+
+    deadline = time.monotonic() + max_wait_seconds
+    attempt = 0
+    previous_state = None
+
+    while True:
+        print("Checking avatar status...")
+        response = _request_with_auth(client, "GET", url)
+        response.raise_for_status()
 
-    print("Checking avatar status...")
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
+        avatar_data = orjson.loads(response.content)
+        attributes = avatar_data.get("data", {}).get("attributes", {})
+        current_state = attributes.get("state", "UNKNOWN")
+        if current_state == "READY" or not poll:
+            break
+
+        # Back off, starting over whenever processing moves to a new state
+        if current_state != previous_state:
+            attempt = 0
+            previous_state = current_state
+        delay = min(60, 2 ** (attempt + 1))
+        if time.monotonic() + delay > deadline:
+            break
 
-    avatar_data = response.json()
+        print(f"Avatar state: {current_state}, checking again in {delay}s...")
+        time.sleep(delay)
+        attempt += 1
 
     # Check if avatar is ready
-    if avatar_data.get("data", {}).get("attributes", {}).get("state") == "READY":
+    if current_state == "READY":
         print("✓ Avatar is ready! Downloading measurements...")
 
         # Extract measurements
         raw_measurements = (
-            avatar_data.get("data", {})
-            .get("attributes", {})
-            .get("metadata", {})
+            attributes.get("metadata", {})
             .get("bodyShape", {})
             .get("mesh_measurements", {})
         )
 
         if raw_measurements:
-            # Convert measurements to include both units
-            processed_measurements = {}
-            for measurement_name, value in raw_measurements.items():
-                if isinstance(value, (int, float)):
-                    if measurement_name.lower() == "weight":
-                        # Weight: kg to lbs conversion
-                        kg_rounded = round(value, 2)
-                        lbs_rounded = round(value * 2.20462, 2)
-                        processed_measurements[measurement_name] = {
-                            "kg": kg_rounded,
-                            "lbs": lbs_rounded,
-                        }
-                    else:
-                        # Length measurements: cm to inches conversion
-                        cm_rounded = round(value, 2)
-                        inches_rounded = round(value / 2.54, 2)
-                        processed_measurements[measurement_name] = {
-                            "cm": cm_rounded,
-                            "in": inches_rounded,
-                        }
-                else:
-                    # Keep non-numeric values as-is
-                    processed_measurements[measurement_name] = value
+            processed_measurements = convert_measurements(raw_measurements)
 
             # Save measurements to file
             subject_dir = Path("data") / subject_name
             measurements_file = subject_dir / "measurements.json"
-            with open(measurements_file, "w") as f:
-                json.dump(processed_measurements, f, indent=2)
+            _dump_json(measurements_file, processed_measurements)
             print(f"✓ Measurements saved to {measurements_file}")
             return True
         else:
             print("❌ No measurements found in response")
             return False
     else:
-        current_state = (
-            avatar_data.get("data", {}).get("attributes", {}).get("state", "UNKNOWN")
-        )
         print(f"❌ Avatar not ready yet. Current state: {current_state}")
         return False
 
 
+def _file_fingerprint(image_file: Path) -> List:
+    """Cheap change fingerprint: size, mtime and a hash of the first 64 KiB."""
+    stat = image_file.stat()
+    with open(image_file, "rb") as f:
+        head_hash = hashlib.sha256(f.read(65536)).hexdigest()
+    return [stat.st_size, stat.st_mtime_ns, head_hash]
+
+
+def upload_fingerprint(avatar_data: dict, image_files: list) -> Dict:
+    """Fingerprint the images and metadata that make up an upload."""
+    return {
+        "images": [[f.name, *_file_fingerprint(f)] for f in image_files],
+        "metadata": {
+            key: avatar_data.get(key) for key in ("gender", "height", "weight")
+        },
+    }
+
+
 def upload_avatar(
-    access_token: str, selected_subject: str, avatar_data: dict, image_files: list
-):
-    """Upload avatar workflow."""
+    client: ApiClient,
+    selected_subject: str,
+    avatar_data: dict,
+    image_files: list,
+    force: bool = False,
+) -> bool:
+    """Upload avatar workflow.
+
+    Returns False without uploading when the images and metadata are unchanged
+    since the last successful upload, unless ``force`` is set.
+    """
+    subject_dir = Path("data") / selected_subject
+    cache_file = subject_dir / UPLOAD_CACHE_FILE
+    fingerprint = None
+    if not force and "avatar_id" in avatar_data and cache_file.exists():
+        fingerprint = upload_fingerprint(avatar_data, image_files)
+        cached = _load_json(cache_file)
+        if cached == {"avatar_id": avatar_data["avatar_id"], **fingerprint}:
+            print(
+                "Images and metadata unchanged since avatar "
+                f"{avatar_data['avatar_id']} was uploaded, skipping "
+                "(use --force-reupload to upload anyway)"
+            )
+            return False
+    if fingerprint is None:
+        fingerprint = upload_fingerprint(avatar_data, image_files)
+
     # Create avatar
     print("Creating avatar...")
-    avatar_id = create_avatar(access_token)
+    avatar_id = create_avatar(client)
     print(f"✓ Avatar created with ID: {avatar_id}")
 
     # Save avatar ID to avatar.json
-    subject_dir = Path("data") / selected_subject
     avatar_file = subject_dir / "avatar.json"
     avatar_data["avatar_id"] = avatar_id
-    with open(avatar_file, "w") as f:
-        json.dump(avatar_data, f, indent=2)
+    _dump_json(avatar_file, avatar_data)
     print(f"✓ Avatar ID saved to {avatar_file}")
 
     # Upload images
     print("Uploading images...")
-    upload_images(access_token, avatar_id, image_files)
+    upload_images(client, avatar_id, image_files)
     print(f"✓ Uploaded {len(image_files)} images")
 
     # Start fitting
     print("Starting fitting process...")
-    start_fitting(access_token, avatar_id, selected_subject, avatar_data)
+    start_fitting(client, avatar_id, selected_subject, avatar_data)
     print("✓ Fitting process started successfully")
 
+    # Remember what was uploaded so unchanged re-runs can be skipped
+    _dump_json(cache_file, {"avatar_id": avatar_id, **fingerprint})
+    return True
+
+
+def run_action(
+    client: ApiClient,
+    subject_name: str,
+    action: str,
+    avatar_data: dict,
+    image_files: list,
+    force_reupload: bool = False,
+    wait: bool = False,
+) -> bool:
+    """Run an action for a subject and report the outcome."""
+    if action == "upload":
+        if upload_avatar(
+            client, subject_name, avatar_data, image_files, force=force_reupload
+        ):
+            print(f"\n🎉 Avatar '{subject_name}' uploaded and processing started!")
+        return True
+
+    if "avatar_id" not in avatar_data:
+        print(f"\n❌ No avatar found for '{subject_name}', upload it first")
+        return False
+
+    if action == "download":
+        success = download_measurements(
+            client, avatar_data["avatar_id"], subject_name, poll=wait
+        )
+        if success:
+            print(f"\n🎉 Measurements downloaded for '{subject_name}'!")
+        else:
+            print(f"\n❌ Could not download measurements for '{subject_name}'")
+    else:
+        success = export_3d_model(client, avatar_data["avatar_id"], subject_name)
+        if success:
+            print(f"\n🎉 3D model exported and saved for '{subject_name}'!")
+        else:
+            print(f"\n❌ Could not export 3D model for '{subject_name}'")
+    return success
+
+
+def process_subject(
+    client: ApiClient,
+    subject_name: str,
+    action: str,
+    force_reupload: bool = False,
+    wait: bool = False,
+) -> bool:
+    """Load a subject's data and run an action on it without prompting."""
+    avatar_data, image_files = load_subject_data(subject_name)
+    return run_action(
+        client, subject_name, action, avatar_data, image_files, force_reupload, wait
+    )
+
+
+def run_batch(
+    subjects: List[str], action: str, force_reupload: bool = False, wait: bool = False
+) -> int:
+    """Run an action for every subject concurrently."""
+    print("Authenticating...")
+    client = create_api_client()
+    print("✓ Authenticated successfully")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {
+            executor.submit(
+                process_subject, client, subject, action, force_reupload, wait
+            ): subject
+            for subject in subjects
+        }
+        for future in as_completed(futures):
+            subject = futures[future]
+            try:
+                if not future.result():
+                    failed.append(subject)
+            except Exception as e:
+                print(f"❌ Error processing '{subject}': {e}")
+                failed.append(subject)
+
+    print(f"\nProcessed {len(subjects) - len(failed)}/{len(subjects)} subjects")
+    if failed:
+        print(f"❌ Failed: {', '.join(sorted(failed))}")
+        return 1
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--subject", help="subject to process, skips the prompt")
+    target.add_argument(
+        "--all",
+        action="store_true",
+        help="process every subject concurrently without prompting",
+    )
+    parser.add_argument(
+        "--action",
+        choices=ACTIONS,
+        help="action to run, skips the prompt (required with --all)",
+    )
+    parser.add_argument(
+        "--force-reupload",
+        action="store_true",
+        help="upload even if images and metadata are unchanged since last upload",
+    )
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="when downloading, keep polling until the avatar is ready",
+    )
+
+    args = parser.parse_args()
+    if args.all and not args.action:
+        parser.error("--all requires --action")
+    return args
+
 
 def main():
     """Main script execution."""
+    args = parse_args()
+
     try:
         # Get available subjects
         subjects = get_available_subjects()
@@ -314,21 +696,30 @@ def main():
             print("No test subjects found in data folder!")
             return
 
-        # Prompt user to select subject
-        print("Available test subjects:")
-        for i, subject in enumerate(subjects, 1):
-            print(f"  {i}. {subject}")
+        if args.all:
+            return run_batch(subjects, args.action, args.force_reupload, args.wait)
 
-        while True:
-            try:
-                choice = int(input(f"\nSelect subject (1-{len(subjects)}): ")) - 1
-                if 0 <= choice < len(subjects):
-                    selected_subject = subjects[choice]
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-            except ValueError:
-                print("Please enter a valid number.")
+        if args.subject:
+            if args.subject not in subjects:
+                print(f"❌ Unknown subject '{args.subject}'")
+                return 1
+            selected_subject = args.subject
+        else:
+            # Prompt user to select subject
+            print("Available test subjects:")
+            for i, subject in enumerate(subjects, 1):
+                print(f"  {i}. {subject}")
+
+            while True:
+                try:
+                    choice = int(input(f"\nSelect subject (1-{len(subjects)}): ")) - 1
+                    if 0 <= choice < len(subjects):
+                        selected_subject = subjects[choice]
+                        break
+                    else:
+                        print("Invalid choice. Please try again.")
+                except ValueError:
+                    print("Please enter a valid number.")
 
         print(f"\nSelected subject: {selected_subject}")
 
@@ -337,63 +728,52 @@ def main():
         print(f"Found {len(image_files)} images")
         print(f"Avatar data: {avatar_data}")
 
-        # Check if avatar_id exists
-        has_avatar_id = "avatar_id" in avatar_data
-
-        # Present options
-        print("\nWhat would you like to do?")
-        if has_avatar_id:
-            print("  1. Re-upload avatar")
-            print("  2. Download measurements")
-            print("  3. Export 3D model")
-            valid_choices = [1, 2, 3]
-        else:
-            print("  1. Upload avatar (no existing avatar found)")
-            valid_choices = [1]
+        action = args.action
+        force_reupload = args.force_reupload
+        if not action:
+            # Present options, mapped onto action names
+            print("\nWhat would you like to do?")
+            if "avatar_id" in avatar_data:
+                print("  1. Re-upload avatar")
+                print("  2. Download measurements")
+                print("  3. Export 3D model")
+                choices = {1: "upload", 2: "download", 3: "export"}
+            else:
+                print("  1. Upload avatar (no existing avatar found)")
+                choices = {1: "upload"}
+
+            while True:
+                try:
+                    choice = int(
+                        input(f"\nSelect action ({'/'.join(map(str, choices))}): ")
+                    )
+                    if choice in choices:
+                        action = choices[choice]
+                        break
+                    else:
+                        print("Invalid choice. Please try again.")
+                except ValueError:
+                    print("Please enter a valid number.")
 
-        while True:
-            try:
-                action = int(
-                    input(f"\nSelect action ({'/'.join(map(str, valid_choices))}): ")
-                )
-                if action in valid_choices:
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-            except ValueError:
-                print("Please enter a valid number.")
+            # Picking "Re-upload" at the prompt is explicit; don't skip it
+            force_reupload = True
 
         # Authenticate
         print("\nAuthenticating...")
-        access_token = authenticate()
+        client = create_api_client()
         print("✓ Authenticated successfully")
 
         # Execute chosen action
-        if has_avatar_id and action == 1:
-            # Re-upload avatar
-            upload_avatar(access_token, selected_subject, avatar_data, image_files)
-            print(f"\n🎉 Avatar '{selected_subject}' uploaded and processing started!")
-        elif has_avatar_id and action == 2:
-            # Download measurements
-            avatar_id = avatar_data["avatar_id"]
-            success = download_measurements(access_token, avatar_id, selected_subject)
-            if success:
-                print(f"\n🎉 Measurements downloaded for '{selected_subject}'!")
-            else:
-                print(f"\n❌ Could not download measurements for '{selected_subject}'")
-        elif has_avatar_id and action == 3:
-            # Export 3D model
-            success = export_3d_model(
-                access_token, avatar_data["avatar_id"], selected_subject
-            )
-            if success:
-                print(f"\n🎉 3D model exported and saved for '{selected_subject}'!")
-            else:
-                print(f"\n❌ Could not export 3D model for '{selected_subject}'")
-        else:
-            # New upload (no existing avatar_id)
-            upload_avatar(access_token, selected_subject, avatar_data, image_files)
-            print(f"\n🎉 Avatar '{selected_subject}' uploaded and processing started!")
+        success = run_action(
+            client,
+            selected_subject,
+            action,
+            avatar_data,
+            image_files,
+            force_reupload,
+            args.wait,
+        )
+        return 0 if success else 1
 
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -401,4 +781,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())